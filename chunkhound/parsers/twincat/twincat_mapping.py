@@ -11,8 +11,8 @@ method that UniversalParser calls when engine=None.
 
 from __future__ import annotations
 
-import functools
 import re
+import threading
 from pathlib import Path
 from typing import Any
 
@@ -35,9 +35,25 @@ _STDLIB_TYPES = frozenset({
 # File extension for TcPOU files (Function Blocks, Interfaces, Programs, Functions)
 _TWINCAT_EXTENSION = ".TcPOU"
 
-@functools.lru_cache(maxsize=1)
+# Array element type separator: ARRAY[...] OF <type>
+_OF_KEYWORD_RE = re.compile(r"\bOF\b")
+
+# Thread-local storage for parser instances
+_parser_local = threading.local()
+
+
 def _get_parser() -> TwinCATParser:
-    return TwinCATParser()
+    """Get this thread's TwinCATParser.
+
+    The parser keeps per-parse state (parse_errors), so instances are not
+    shared across threads. Construction is cheap because the compiled Lark
+    grammars are shared process-wide.
+    """
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = TwinCATParser()
+        _parser_local.parser = parser
+    return parser
 
 
 class TwinCATMapping(BaseMapping):
@@ -122,7 +138,7 @@ class TwinCATMapping(BaseMapping):
                 break
 
         # Handle ARRAY types FIRST - extract element type after last OF
-        of_matches = list(re.finditer(r"\bOF\b", upper_part))
+        of_matches = list(_OF_KEYWORD_RE.finditer(upper_part))
         if of_matches:
             of_pos = of_matches[-1].start()  # Last match for nested arrays
             type_part = type_part[of_pos + 2 :].strip()
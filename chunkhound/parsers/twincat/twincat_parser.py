@@ -7,6 +7,7 @@ Architecture: Custom Orchestration (like Svelte/Vue)
 - Adjusts line numbers from CDATA-relative to XML-absolute
 """
 
+import functools
 import re
 from pathlib import Path
 from typing import Any
@@ -32,6 +33,9 @@ BLOCK_COMMENT_RE = re.compile(r"\(\*[\s\S]*?\*\)")
 # Line comments: // ...
 LINE_COMMENT_RE = re.compile(r"//[^\n]*")
 
+# Directory holding the .lark grammar files
+_GRAMMAR_DIR = Path(__file__).parent
+
 # Map VAR block keywords to semantic variable classes
 VAR_BLOCK_MAP = {
     "VAR_INPUT": "input",
@@ -45,6 +49,21 @@ VAR_BLOCK_MAP = {
 }
 
 
+@functools.cache
+def _load_grammar(grammar_name: str) -> Lark:
+    """Build a LALR parser for a grammar file, shared by all parser instances.
+
+    Lark parsers are stateless between parse() calls, so the grammar
+    analysis only needs to run once per process.
+    """
+    return Lark.open(
+        str(_GRAMMAR_DIR / grammar_name),
+        parser="lalr",
+        lexer="contextual",
+        propagate_positions=True,
+    )
+
+
 class TwinCATParser:
     """Parser for TwinCAT TcPOU files.
 
@@ -53,7 +72,6 @@ class TwinCATParser:
     """
 
     def __init__(self) -> None:
-        self._grammar_dir = Path(__file__).parent
         self._decl_parser: Lark | None = None
         self._impl_parser: Lark | None = None
         self._extractor = TcPOUExtractor()
@@ -64,17 +82,16 @@ class TwinCATParser:
         """Errors from the most recent parse operation. Cleared on each parse."""
         return self._parse_errors
 
+    def _record_error(self, error_msg: str) -> None:
+        """Log a parse error and record it for the current parse."""
+        logger.error(error_msg)
+        self._parse_errors.append(error_msg)
+
     @property
     def decl_parser(self) -> Lark:
         """Lazy-load declaration parser."""
         if self._decl_parser is None:
-            grammar_path = self._grammar_dir / "declarations.lark"
-            self._decl_parser = Lark.open(
-                str(grammar_path),
-                parser="lalr",
-                lexer="contextual",
-                propagate_positions=True,
-            )
+            self._decl_parser = _load_grammar("declarations.lark")
         return self._decl_parser
 
     @property
@@ -85,13 +102,7 @@ class TwinCATParser:
         when extracting detailed chunk information from TcPOU files.
         """
         if self._impl_parser is None:
-            grammar_path = self._grammar_dir / "implementation.lark"
-            self._impl_parser = Lark.open(
-                str(grammar_path),
-                parser="lalr",
-                lexer="contextual",
-                propagate_positions=True,
-            )
+            self._impl_parser = _load_grammar("implementation.lark")
         return self._impl_parser
 
     # =========================================================================
@@ -134,6 +145,8 @@ class TwinCATParser:
         chunks.extend(pou_chunks)
 
         # 2. Parse declaration section → extract variable chunks
+        # (the tree is reused for import extraction in step 7)
+        decl_tree: Tree | None = None
         if content.declaration and content.declaration.strip():
             try:
                 decl_tree = self.decl_parser.parse(content.declaration)
@@ -143,8 +156,7 @@ class TwinCATParser:
                 chunks.extend(var_chunks)
             except LarkError as e:
                 error_msg = f"Declaration parse error in {content.name}: {e}"
-                logger.error(error_msg)
-                self._parse_errors.append(error_msg)
+                self._record_error(error_msg)
 
         if content.implementation and content.implementation.strip():
             block_chunks = self._extract_block_universal_chunks_from_implementation(
@@ -208,8 +220,11 @@ class TwinCATParser:
             chunks.extend(property_chunks)
 
         # 7. Extract imports (VAR_EXTERNAL, EXTENDS, IMPLEMENTS, type references)
-        import_chunks = self._extract_import_universal_chunks_from_pou(content)
-        chunks.extend(import_chunks)
+        if decl_tree is not None:
+            import_chunks = self._extract_import_universal_chunks_from_tree(
+                decl_tree, content
+            )
+            chunks.extend(import_chunks)
 
         # Validate chunk positions against raw file content
         self._validate_chunk_positions(chunks, raw_content)
@@ -217,7 +232,9 @@ class TwinCATParser:
         # Stable sort: by start line, then larger spans first (containers first).
         # The -end_line trick: when chunks share a start line, larger spans
         # (more negative -end_line) sort first, placing containers before children.
-        return sorted(chunks, key=lambda c: (c.start_line, -c.end_line))
+        # Sorted in place: chunks is local, so no copy is needed.
+        chunks.sort(key=lambda c: (c.start_line, -c.end_line))
+        return chunks
 
 
     def _map_chunk_type_to_concept(self, chunk_type: ChunkType) -> UniversalConcept:
@@ -272,11 +289,34 @@ class TwinCATParser:
         Returns:
             UniversalChunk instance
         """
+        return self._build_universal_chunk(
+            chunk_type=chunk_type,
+            name=name,
+            content=content,
+            start_line=start_line,
+            end_line=end_line,
+            metadata=dict(metadata),
+            language_node_type=language_node_type,
+        )
+
+    def _build_universal_chunk(
+        self,
+        chunk_type: ChunkType,
+        name: str,
+        content: str,
+        start_line: int,
+        end_line: int,
+        metadata: dict[str, Any],
+        language_node_type: str,
+    ) -> UniversalChunk:
+        """Create UniversalChunk, taking ownership of a freshly built metadata dict.
+
+        Like _create_universal_chunk, but adds chunk_type_hint to `metadata`
+        in place instead of copying it. Use only when the dict was built
+        for this chunk alone.
+        """
         # Store original ChunkType name for accurate reverse mapping
-        enriched_metadata = {
-            **metadata,
-            "chunk_type_hint": chunk_type.name.lower(),
-        }
+        metadata["chunk_type_hint"] = chunk_type.name.lower()
 
         return UniversalChunk(
             concept=self._map_chunk_type_to_concept(chunk_type),
@@ -284,7 +324,7 @@ class TwinCATParser:
             content=content,
             start_line=start_line,
             end_line=end_line,
-            metadata=enriched_metadata,
+            metadata=metadata,
             language_node_type=language_node_type,
         )
 
@@ -480,7 +520,7 @@ class TwinCATParser:
         location = declaration_location or content.declaration_location
 
         # Adjust line number to XML position
-        adjusted_line = self._adjust_line_number(line, location)
+        adjusted_line = line + (location.line - 1 if location else 0)
 
         for child in var_decl.children:
             if isinstance(child, Token):
@@ -525,7 +565,8 @@ class TwinCATParser:
         if method_name:
             metadata["method_name"] = method_name
 
-        # Create a chunk for each variable name
+        # Create a chunk for each variable name; _create_universal_chunk
+        # builds a fresh metadata dict per chunk, so the template is shared
         for var_name in var_names:
             fqn = self._build_fqn(content.name, var_name, method_name, action_name)
             chunk = self._create_universal_chunk(
@@ -534,7 +575,7 @@ class TwinCATParser:
                 content=code,
                 start_line=adjusted_line,
                 end_line=adjusted_line,
-                metadata=metadata.copy(),
+                metadata=metadata,
                 language_node_type="lark_var_declaration",
             )
             chunks.append(chunk)
@@ -605,8 +646,7 @@ class TwinCATParser:
                 chunks.extend(var_chunks)
             except LarkError as e:
                 error_msg = f"Action '{action.name}' declaration parse error: {e}"
-                logger.error(error_msg)
-                self._parse_errors.append(error_msg)
+                self._record_error(error_msg)
 
         # Parse action implementation for control flow blocks
         if action.implementation and action.implementation.strip():
@@ -718,8 +758,7 @@ class TwinCATParser:
                 chunks.extend(var_chunks)
             except LarkError as e:
                 error_msg = f"Method '{method.name}' declaration parse error: {e}"
-                logger.error(error_msg)
-                self._parse_errors.append(error_msg)
+                self._record_error(error_msg)
 
         # Parse method implementation for control flow blocks
         if method.implementation and method.implementation.strip():
@@ -853,18 +892,25 @@ class TwinCATParser:
             else:
                 context = f"FUNCTION '{pou_name}'"
             error_msg = f"Implementation parse error in {context}: {e}"
-            logger.error(error_msg)
-            self._parse_errors.append(error_msg)
+            self._record_error(error_msg)
             return chunks
 
+        # Offset from CDATA-relative to XML-absolute line numbers
+        line_offset = (
+            implementation_location.line - 1 if implementation_location else 0
+        )
+
+        # Split once; every block slices its code from the same lines
+        implementation_lines = implementation.splitlines()
+
         # Find all control flow statement nodes
         statement_nodes = self._find_statement_nodes(tree)
 
         for node in statement_nodes:
             chunk = self._create_block_universal_chunk(
                 node,
-                implementation,
-                implementation_location,
+                implementation_lines,
+                line_offset,
                 pou_name,
                 pou_type,
                 file_path,
@@ -879,8 +925,8 @@ class TwinCATParser:
     def _create_block_universal_chunk(
         self,
         node: Tree,
-        implementation: str,
-        implementation_location: SourceLocation | None,
+        implementation_lines: list[str],
+        line_offset: int,
         pou_name: str,
         pou_type: str,
         file_path: Path | None,
@@ -896,11 +942,13 @@ class TwinCATParser:
         end_line = node.meta.end_line or start_line
 
         # Reconstruct code from implementation using line numbers
-        code = self._reconstruct_code_from_lines(implementation, start_line, end_line)
+        code = self._reconstruct_code_from_lines(
+            implementation_lines, start_line, end_line
+        )
 
         # Adjust line numbers to XML-absolute
-        adjusted_start = self._adjust_line_number(start_line, implementation_location)
-        adjusted_end = self._adjust_line_number(end_line, implementation_location)
+        adjusted_start = start_line + line_offset
+        adjusted_end = end_line + line_offset
 
         # Determine kind from statement type
         kind = self._STATEMENT_KIND_MAP.get(node.data, "block")
@@ -921,7 +969,7 @@ class TwinCATParser:
         if method_name:
             metadata["method_name"] = method_name
 
-        return self._create_universal_chunk(
+        return self._build_universal_chunk(
             chunk_type=ChunkType.BLOCK,
             name=symbol,
             content=code,
@@ -944,31 +992,47 @@ class TwinCATParser:
         """Extract comments as UniversalChunks."""
         chunks: list[UniversalChunk] = []
 
+        # Metadata shared by every comment in this section
+        base_metadata: dict[str, Any] = {
+            "kind": "comment",
+            "pou_name": pou_name,
+            "pou_type": pou_type,
+        }
+        if method_name:
+            base_metadata["method_name"] = method_name
+        if action_name:
+            base_metadata["action_name"] = action_name
+
         # Block comments: (* ... *)
+        line = base_line
+        prev_start = 0
         for match in BLOCK_COMMENT_RE.finditer(source):
-            line = source[: match.start()].count("\n") + base_line
+            # Count only the newlines since the previous match
+            line += source.count("\n", prev_start, match.start())
+            prev_start = match.start()
             chunk = self._create_comment_universal_chunk(
                 content=match.group(),
                 line=line,
-                file_path=file_path,
                 pou_name=pou_name,
-                pou_type=pou_type,
                 comment_type="block",
+                base_metadata=base_metadata,
                 method_name=method_name,
                 action_name=action_name,
             )
             chunks.append(chunk)
 
         # Line comments: // ...
+        line = base_line
+        prev_start = 0
         for match in LINE_COMMENT_RE.finditer(source):
-            line = source[: match.start()].count("\n") + base_line
+            line += source.count("\n", prev_start, match.start())
+            prev_start = match.start()
             chunk = self._create_comment_universal_chunk(
                 content=match.group(),
                 line=line,
-                file_path=file_path,
                 pou_name=pou_name,
-                pou_type=pou_type,
                 comment_type="line",
+                base_metadata=base_metadata,
                 method_name=method_name,
                 action_name=action_name,
             )
@@ -980,10 +1044,9 @@ class TwinCATParser:
         self,
         content: str,
         line: int,
-        file_path: Path | None,
         pou_name: str,
-        pou_type: str,
         comment_type: str,
+        base_metadata: dict[str, Any],
         method_name: str | None = None,
         action_name: str | None = None,
     ) -> UniversalChunk:
@@ -998,20 +1061,13 @@ class TwinCATParser:
         # Clean comment text (strip markers)
         cleaned_text = self._clean_st_comment(content)
 
-        # Build metadata
-        metadata: dict[str, Any] = {
-            "kind": "comment",
+        metadata = {
+            **base_metadata,
             "comment_type": comment_type,
-            "pou_name": pou_name,
-            "pou_type": pou_type,
             "cleaned_text": cleaned_text,
         }
-        if method_name:
-            metadata["method_name"] = method_name
-        if action_name:
-            metadata["action_name"] = action_name
 
-        return self._create_universal_chunk(
+        return self._build_universal_chunk(
             chunk_type=ChunkType.COMMENT,
             name=fqn,
             content=content,
@@ -1124,14 +1180,6 @@ class TwinCATParser:
 
         return "".join(parts)
 
-    def _adjust_line_number(
-        self, line: int, location: SourceLocation | None
-    ) -> int:
-        """Adjust line number from CDATA-relative to XML-absolute."""
-        if location is None:
-            return line
-        return line + (location.line - 1)
-
     def _validate_chunk_positions(
         self,
         chunks: list[UniversalChunk],
@@ -1253,37 +1301,32 @@ class TwinCATParser:
     }
 
     def _find_statement_nodes(self, tree: Tree) -> list[Tree]:
-        """Recursively find all control flow statement nodes in parse tree.
+        """Find all control flow statement nodes in parse tree.
 
         Finds: if_stmt, case_stmt, for_stmt, while_stmt, repeat_stmt
-        """
-        results: list[Tree] = []
 
-        if isinstance(tree, Tree):
-            if tree.data in self._STATEMENT_KIND_MAP:
-                results.append(tree)
-            # Recurse into children to find nested statements
-            for child in tree.children:
-                if isinstance(child, Tree):
-                    results.extend(self._find_statement_nodes(child))
-
-        return results
+        Walks the tree once in pre-order (outer blocks before nested ones)
+        without recursion or intermediate result lists.
+        """
+        return [
+            subtree
+            for subtree in tree.iter_subtrees_topdown()
+            if subtree.data in self._STATEMENT_KIND_MAP
+        ]
 
     def _reconstruct_code_from_lines(
-        self, source: str, start_line: int, end_line: int
+        self, lines: list[str], start_line: int, end_line: int
     ) -> str:
         """Extract code substring using line numbers.
 
         Args:
-            source: Full source code string
+            lines: Source code split into lines
             start_line: 1-based start line number
             end_line: 1-based end line number (inclusive)
 
         Returns:
             Code substring spanning the specified lines
         """
-        lines = source.splitlines()
-
         # Convert to 0-based indices
         start_idx = max(0, start_line - 1)
         end_idx = min(len(lines), end_line)
@@ -1355,17 +1398,25 @@ class TwinCATParser:
         - IMPLEMENTS interface implementations
         - User-defined type references in variable declarations
         """
-        chunks: list[UniversalChunk] = []
-
         # Parse declaration section
         if not content.declaration or not content.declaration.strip():
-            return chunks
+            return []
 
         try:
             decl_tree = self.decl_parser.parse(content.declaration)
         except LarkError:
             # Parse errors already logged in main extraction
-            return chunks
+            return []
+
+        return self._extract_import_universal_chunks_from_tree(decl_tree, content)
+
+    def _extract_import_universal_chunks_from_tree(
+        self,
+        decl_tree: Tree,
+        content: POUContent,
+    ) -> list[UniversalChunk]:
+        """Extract import-like constructs from an already parsed declaration."""
+        chunks: list[UniversalChunk] = []
 
         # 1. Extract VAR_EXTERNAL imports
         var_external_chunks = self._extract_var_external_imports(decl_tree, content)
@@ -1440,7 +1491,8 @@ class TwinCATParser:
 
         # Get line number
         line = var_decl.meta.line if hasattr(var_decl, "meta") and var_decl.meta else 1
-        adjusted_line = self._adjust_line_number(line, content.declaration_location)
+        location = content.declaration_location
+        adjusted_line = line + (location.line - 1 if location else 0)
 
         # Build FQN
         fqn = f"{content.name}.{var_name}"
@@ -1522,7 +1574,8 @@ class TwinCATParser:
             if hasattr(extends_clause, "meta") and extends_clause.meta
             else 1
         )
-        adjusted_line = self._adjust_line_number(line, content.declaration_location)
+        location = content.declaration_location
+        adjusted_line = line + (location.line - 1 if location else 0)
 
         # Build FQN
         fqn = f"{content.name}:extends:{base_type}"
@@ -1560,7 +1613,8 @@ class TwinCATParser:
             if hasattr(implements_clause, "meta") and implements_clause.meta
             else 1
         )
-        adjusted_line = self._adjust_line_number(line, content.declaration_location)
+        location = content.declaration_location
+        adjusted_line = line + (location.line - 1 if location else 0)
 
         # Extract all interface identifiers
         for child in implements_clause.children:
@@ -1678,7 +1732,8 @@ class TwinCATParser:
         """Create import chunk for a user-defined type reference."""
         # Get line number
         line = var_decl.meta.line if hasattr(var_decl, "meta") and var_decl.meta else 1
-        adjusted_line = self._adjust_line_number(line, content.declaration_location)
+        location = content.declaration_location
+        adjusted_line = line + (location.line - 1 if location else 0)
 
         # Build FQN
         fqn = f"{content.name}:type_ref:{referenced_type}"
@@ -1,5 +1,6 @@
 """Extract ST code from TcPOU XML files."""
 
+import codecs
 import re
 import xml.etree.ElementTree as ET
 from dataclasses import dataclass
@@ -7,6 +8,48 @@ from pathlib import Path
 
 from .exceptions import XMLExtractionError
 
+# Opening tags of the elements that wrap CDATA sections.
+# Matches <ElementName> or <ElementName ...>
+_ELEMENT_TAG_RES = {
+    name: re.compile(rf"<{name}(?:\s[^>]*)?>")
+    for name in ("Declaration", "Implementation", "ST")
+}
+
+# Whitespace, block comments (* ... *) and line comments // ... before
+# the first code character of a declaration
+_LEADING_TRIVIA_RE = re.compile(r"(?:\s|\(\*[\s\S]*?\*\)|//[^\n]*)*")
+
+# Opening tags of property accessors
+_ACCESSOR_TAG_RES = {
+    name: re.compile(rf"<{name}(?:\s|>)") for name in ("Get", "Set")
+}
+
+# Encoding named in the XML declaration of an ASCII-compatible document
+_XML_ENCODING_RE = re.compile(
+    rb"<\?xml[^>]*?\sencoding\s*=\s*[\"']([A-Za-z0-9._-]+)[\"']"
+)
+
+
+def _detect_xml_encoding(xml_bytes: bytes) -> str:
+    """Return the encoding the XML parser will use to decode `xml_bytes`.
+
+    Checks for a UTF-16 byte order mark first, then the encoding declaration.
+    Defaults to UTF-8 (also for unknown encoding names).
+    """
+    if xml_bytes.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    match = _XML_ENCODING_RE.match(xml_bytes)
+    if match:
+        encoding = match.group(1).decode("ascii")
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return "utf-8"
+        return encoding
+
+    return "utf-8"
+
 
 @dataclass
 class SourceLocation:
@@ -85,36 +128,52 @@ class TcPOUExtractor:
             XMLExtractionError: If the file cannot be parsed or is invalid
         """
         path = Path(path)
-        if not path.exists():
-            raise XMLExtractionError(f"File not found: {path}")
-
-        # Read file as text first for position tracking
-        xml_text = path.read_text(encoding="utf-8", errors="replace")
-
         try:
-            root = ET.fromstring(xml_text)
-        except ET.ParseError as e:
-            raise XMLExtractionError(f"Invalid XML in {path}: {e}")
+            xml_bytes = path.read_bytes()
+        except FileNotFoundError:
+            raise XMLExtractionError(f"File not found: {path}")
 
-        return self._extract_from_element(root, str(path), xml_text)
+        return self.extract_string(xml_bytes, str(path))
 
-    def extract_string(self, xml_content: str, source: str = "<string>") -> POUContent:
+    def extract_string(
+        self, xml_content: str | bytes, source: str = "<string>"
+    ) -> POUContent:
         """Extract all ST content from XML string.
 
         Args:
-            xml_content: TcPOU XML as string
+            xml_content: TcPOU XML as string, or raw bytes as read from disk
+                (the XML parser then honours the encoding declaration itself)
             source: Source identifier for error messages
 
         Returns:
             POUContent with declaration, implementation, and actions
         """
+        if isinstance(xml_content, bytes):
+            # Decode once for position tracking, with the same encoding the
+            # XML parser uses so CDATA offsets line up
+            xml_text = xml_content.decode(
+                _detect_xml_encoding(xml_content), errors="replace"
+            )
+            try:
+                root = ET.fromstring(xml_content)
+            except ET.ParseError:
+                # Bytes that don't match the declared encoding (e.g. a stray
+                # cp1252 byte) are rejected by expat; retry with the lenient
+                # decode so such files are still extracted
+                root = self._parse_xml_text(xml_text, source)
+        else:
+            xml_text = xml_content
+            root = self._parse_xml_text(xml_text, source)
+
+        return self._extract_from_element(root, source, xml_text)
+
+    def _parse_xml_text(self, xml_text: str, source: str) -> ET.Element:
+        """Parse decoded XML text, wrapping parser errors."""
         try:
-            root = ET.fromstring(xml_content)
+            return ET.fromstring(xml_text)
         except ET.ParseError as e:
             raise XMLExtractionError(f"Invalid XML in {source}: {e}")
 
-        return self._extract_from_element(root, source, xml_content)
-
     def _find_cdata_content_start(
         self, xml_text: str, search_start: int, element_path: list[str]
     ) -> SourceLocation | None:
@@ -135,12 +194,10 @@ class TcPOUExtractor:
         # Navigate through each element in the path
         for element_name in element_path:
             # Find the opening tag for this element
-            # Pattern matches <ElementName or <ElementName> or <ElementName ...>
-            tag_pattern = rf"<{element_name}(?:\s[^>]*)?>|<{element_name}>"
-            match = re.search(tag_pattern, xml_text[pos:])
+            match = _ELEMENT_TAG_RES[element_name].search(xml_text, pos)
             if not match:
                 return None
-            pos += match.end()
+            pos = match.end()
 
         # Now find the CDATA marker after the last element tag
         cdata_marker = "<![CDATA["
@@ -152,12 +209,11 @@ class TcPOUExtractor:
         content_start = cdata_pos + len(cdata_marker)
 
         # Calculate line and column
-        # Count newlines before content_start
-        text_before = xml_text[:content_start]
-        line = text_before.count("\n") + 1
+        # Count newlines before content_start (bounded, no slice copy)
+        line = xml_text.count("\n", 0, content_start) + 1
 
         # Find position of last newline before content_start
-        last_newline = text_before.rfind("\n")
+        last_newline = xml_text.rfind("\n", 0, content_start)
         if last_newline == -1:
             column = content_start + 1  # No newline, column is pos + 1 (1-indexed)
         else:
@@ -227,55 +283,37 @@ class TcPOUExtractor:
         # Track position for finding action elements
         action_search_start = pou_search_start
         for action_elem in pou.findall("Action"):
-            action = self._extract_action(
+            action, next_search_start = self._extract_action(
                 action_elem, source, xml_text, action_search_start
             )
             if action:
                 actions.append(action)
                 # Move search start past this action for the next one
-                if xml_text and action.name:
-                    action_match = re.search(
-                        rf'<Action\s+Name="{re.escape(action.name)}"',
-                        xml_text[action_search_start:],
-                    )
-                    if action_match:
-                        action_search_start += action_match.end()
+                action_search_start = next_search_start
 
         # Extract methods
         methods = []
         method_search_start = pou_search_start
         for method_elem in pou.findall("Method"):
-            method = self._extract_method(
+            method, next_search_start = self._extract_method(
                 method_elem, source, xml_text, method_search_start
             )
             if method:
                 methods.append(method)
                 # Move search start past this method for the next one
-                if xml_text and method.name:
-                    method_match = re.search(
-                        rf'<Method\s+Name="{re.escape(method.name)}"',
-                        xml_text[method_search_start:],
-                    )
-                    if method_match:
-                        method_search_start += method_match.end()
+                method_search_start = next_search_start
 
         # Extract properties
         properties = []
         property_search_start = pou_search_start
         for property_elem in pou.findall("Property"):
-            prop = self._extract_property(
+            prop, next_search_start = self._extract_property(
                 property_elem, source, xml_text, property_search_start
             )
             if prop:
                 properties.append(prop)
                 # Move search start past this property for the next one
-                if xml_text and prop.name:
-                    property_match = re.search(
-                        rf'<Property\s+Name="{re.escape(prop.name)}"',
-                        xml_text[property_search_start:],
-                    )
-                    if property_match:
-                        property_search_start += property_match.end()
+                property_search_start = next_search_start
 
         return POUContent(
             name=name,
@@ -296,22 +334,29 @@ class TcPOUExtractor:
         source: str,
         xml_text: str | None = None,
         search_start: int = 0,
-    ) -> ActionContent | None:
-        """Extract content from an Action element."""
+    ) -> tuple[ActionContent | None, int]:
+        """Extract content from an Action element.
+
+        Returns:
+            Tuple of the extracted content (or None) and the offset just past
+            the Action opening tag, for the caller's next search.
+        """
         name = action_elem.get("Name")
         if not name:
-            return None
+            return None, search_start
 
         action_id = action_elem.get("Id", "")
 
         # Find action start position in XML for location tracking
         action_search_start = search_start
+        next_search_start = search_start
         if xml_text:
             action_match = re.search(
                 rf'<Action\s+Name="{re.escape(name)}"', xml_text[search_start:]
             )
             if action_match:
                 action_search_start = search_start + action_match.start()
+                next_search_start = search_start + action_match.end()
 
         # Actions may have their own Declaration
         decl_elem = action_elem.find("Declaration")
@@ -329,7 +374,7 @@ class TcPOUExtractor:
         # Extract implementation
         impl_elem = action_elem.find("Implementation")
         if impl_elem is None:
-            return None
+            return None, search_start
 
         st_elem = impl_elem.find("ST")
         if st_elem is None or st_elem.text is None:
@@ -344,7 +389,7 @@ class TcPOUExtractor:
                 xml_text, action_search_start, ["Implementation", "ST"]
             )
 
-        return ActionContent(
+        action = ActionContent(
             name=name,
             id=action_id,
             declaration=declaration,
@@ -352,6 +397,7 @@ class TcPOUExtractor:
             declaration_location=declaration_location,
             implementation_location=implementation_location,
         )
+        return action, next_search_start
 
     def _extract_method(
         self,
@@ -359,22 +405,29 @@ class TcPOUExtractor:
         source: str,
         xml_text: str | None = None,
         search_start: int = 0,
-    ) -> MethodContent | None:
-        """Extract content from a Method element."""
+    ) -> tuple[MethodContent | None, int]:
+        """Extract content from a Method element.
+
+        Returns:
+            Tuple of the extracted content (or None) and the offset just past
+            the Method opening tag, for the caller's next search.
+        """
         name = method_elem.get("Name")
         if not name:
-            return None
+            return None, search_start
 
         method_id = method_elem.get("Id", "")
 
         # Find method start position in XML for location tracking
         method_search_start = search_start
+        next_search_start = search_start
         if xml_text:
             method_match = re.search(
                 rf'<Method\s+Name="{re.escape(name)}"', xml_text[search_start:]
             )
             if method_match:
                 method_search_start = search_start + method_match.start()
+                next_search_start = search_start + method_match.end()
 
         # Extract declaration
         decl_elem = method_elem.find("Declaration")
@@ -404,7 +457,7 @@ class TcPOUExtractor:
                 xml_text, method_search_start, ["Implementation", "ST"]
             )
 
-        return MethodContent(
+        method = MethodContent(
             name=name,
             id=method_id,
             declaration=declaration,
@@ -412,6 +465,7 @@ class TcPOUExtractor:
             declaration_location=declaration_location,
             implementation_location=implementation_location,
         )
+        return method, next_search_start
 
     def _extract_property(
         self,
@@ -419,22 +473,29 @@ class TcPOUExtractor:
         source: str,
         xml_text: str | None = None,
         search_start: int = 0,
-    ) -> PropertyContent | None:
-        """Extract content from a Property element."""
+    ) -> tuple[PropertyContent | None, int]:
+        """Extract content from a Property element.
+
+        Returns:
+            Tuple of the extracted content (or None) and the offset just past
+            the Property opening tag, for the caller's next search.
+        """
         name = property_elem.get("Name")
         if not name:
-            return None
+            return None, search_start
 
         property_id = property_elem.get("Id", "")
 
         # Find property start position in XML for location tracking
         property_search_start = search_start
+        next_search_start = search_start
         if xml_text:
             property_match = re.search(
                 rf'<Property\s+Name="{re.escape(name)}"', xml_text[search_start:]
             )
             if property_match:
                 property_search_start = search_start + property_match.start()
+                next_search_start = search_start + property_match.end()
 
         # Extract declaration
         decl_elem = property_elem.find("Declaration")
@@ -463,7 +524,7 @@ class TcPOUExtractor:
                 set_elem, "Set", source, xml_text, property_search_start
             )
 
-        return PropertyContent(
+        prop = PropertyContent(
             name=name,
             id=property_id,
             declaration=declaration,
@@ -471,6 +532,7 @@ class TcPOUExtractor:
             set=set_accessor,
             declaration_location=declaration_location,
         )
+        return prop, next_search_start
 
     def _extract_property_accessor(
         self,
@@ -486,11 +548,11 @@ class TcPOUExtractor:
         # Find accessor start position
         accessor_search_start = search_start
         if xml_text:
-            accessor_match = re.search(
-                rf"<{accessor_name}(?:\s|>)", xml_text[search_start:]
+            accessor_match = _ACCESSOR_TAG_RES[accessor_name].search(
+                xml_text, search_start
             )
             if accessor_match:
-                accessor_search_start = search_start + accessor_match.start()
+                accessor_search_start = accessor_match.start()
 
         # Extract declaration
         decl_elem = accessor_elem.find("Declaration")
@@ -534,30 +596,11 @@ class TcPOUExtractor:
 
         Skips comments (// and (* ... *)) to find the actual POU keyword.
         """
-        # Remove line comments and block comments to find the POU keyword
-        cleaned = declaration
-        # Remove block comments (* ... *)
-        while "(*" in cleaned:
-            start = cleaned.find("(*")
-            end = cleaned.find("*)", start)
-            if end == -1:
-                # Unclosed block comment, just remove to end
-                cleaned = cleaned[:start]
-            else:
-                cleaned = cleaned[:start] + cleaned[end + 2 :]
-        # Remove line comments
-        lines = cleaned.split("\n")
-        non_comment_lines = []
-        for line in lines:
-            # Remove // comments
-            comment_pos = line.find("//")
-            if comment_pos != -1:
-                line = line[:comment_pos]
-            if line.strip():
-                non_comment_lines.append(line.strip())
-
-        # Find the first non-empty line after removing comments
-        cleaned_text = " ".join(non_comment_lines).upper().lstrip()
+        # Skip leading whitespace and comments in one pass; the POU keyword
+        # must start at the first code character
+        trivia = _LEADING_TRIVIA_RE.match(declaration)
+        start = trivia.end() if trivia else 0
+        cleaned_text = declaration[start : start + len("FUNCTION_BLOCK")].upper()
 
         if cleaned_text.startswith("PROGRAM"):
             return "PROGRAM"
@@ -17,7 +17,7 @@ class UniversalConcept(Enum):
     STRUCTURE = "structure"  # Hierarchical organization (headers, sections)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UniversalChunk:
     """Language-agnostic representation of semantic code unit."""
 